@@ -1,14 +1,30 @@
 # main.py
 import os
+import re
+import math
 import json
 import uuid
+import asyncio
+import contextlib
+import fcntl
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Annotated, Optional, List, Dict, Any, Union
 
-from fastapi import FastAPI, Request, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+import aiofiles
+from anyio import from_thread
+import orjson
+from fastapi import FastAPI, Request, UploadFile, File, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field
+from sqlalchemy import BigInteger, Column, String, Text, create_engine, event, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
 # ---------------------
 # Ensure folders exist
@@ -19,37 +35,206 @@ os.makedirs("data", exist_ok=True)
 # ---------------------
 # Simple JSON storage helpers
 # ---------------------
+# parsed file contents keyed by filename -> ((st_mtime_ns, st_size), data);
+# a file is only re-read when its stat signature changes
+_cache: Dict[str, Any] = {}
+
+def _file_sig(st):
+    return (st.st_mtime_ns, st.st_size)
+
+def _atomic_write(path, data):
+    # write to a temp file in the same dir, fsync once, then rename over the
+    # target so readers never see a truncated or half-written file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        os.fchmod(fd, 0o644)  # mkstemp creates 0600; match _append_jsonl
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
 def _load_json(filename, default):
     path = os.path.join("data", filename)
-    if not os.path.exists(path):
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(default, f)
-        return default
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        sig = _file_sig(os.stat(path))
+        cached = _cache.get(filename)
+        if cached and cached[0] == sig:
+            return cached[1]
+        with open(path, "rb") as f:
+            data = orjson.loads(f.read())
+        _cache[filename] = (sig, data)
+        return data
     except Exception:
         return default
 
-def _save_json(filename, obj):
+# ---------------------
+# Append-only JSON Lines storage (reminders, reviews)
+# ---------------------
+def _load_jsonl(filename):
+    path = os.path.join("data", filename)
+    if not os.path.exists(path):
+        return []
+    sig = _file_sig(os.stat(path))
+    cached = _cache.get(filename)
+    if cached and cached[0] == sig:
+        return cached[1]
+    with open(path, "rb") as f:
+        lines = f.read().splitlines()
+    data = []
+    for n, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            data.append(orjson.loads(line))
+        except orjson.JSONDecodeError:
+            # e.g. a partial last line left by a crash mid-append
+            print(f"Skipping unreadable line {n} in {filename}")
+    _cache[filename] = (sig, data)
+    return data
+
+def _append_jsonl(filename, record):
+    _append_jsonl_many(filename, [record])
+
+def _append_jsonl_many(filename, records):
     path = os.path.join("data", filename)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
+    buf = b"".join(orjson.dumps(record) + b"\n" for record in records)
+    # O_APPEND keeps the batch a single write at the end of the file
+    fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        before = _file_sig(os.fstat(fd))
+        if before[1] and os.pread(fd, 1, before[1] - 1) != b"\n":
+            # never glue a record onto an unterminated (partial) line
+            buf = b"\n" + buf
+        view = memoryview(buf)
+        while view:
+            view = view[os.write(fd, view):]
+        # extend a cached copy in place if nothing else touched the file meanwhile
+        after = _file_sig(os.fstat(fd))
+        cached = _cache.get(filename)
+        if cached and cached[0] == before and after[1] == before[1] + len(buf):
+            cached[1].extend(records)
+            _cache[filename] = (after, cached[1])
+    finally:
+        os.close(fd)
+
+def _migrate_to_jsonl(old_filename, new_filename):
+    # one-time conversion of the old list-in-a-file format; the old file is kept
+    old_path = os.path.join("data", old_filename)
+    new_path = os.path.join("data", new_filename)
+    if os.path.exists(new_path) or not os.path.exists(old_path):
+        return
+    try:
+        with open(old_path, "rb") as f:
+            items = orjson.loads(f.read())
+        if not isinstance(items, list):
+            raise ValueError("expected a JSON list")
+    except ValueError as e:
+        # don't create the new file: it would mark the data as migrated and hide it
+        print(f"Not migrating {old_filename}: unreadable ({e}); fix or remove it and restart")
+        return
+    _atomic_write(new_path, b"".join(orjson.dumps(item) + b"\n" for item in items))
+
+# ---------------------
+# SQLite storage (profiles, device tokens)
+# ---------------------
+# SQLite only: the connect pragmas and the ON CONFLICT upserts below are SQLite-specific
+DATABASE_URL = "sqlite:///./medibuddy.db"
 
-# initialize basic data files if missing
-_load_json("reminders.json", [])
-_load_json("reviews.json", [])
-_load_json("profiles.json", {})
-_load_json("tokens.json", {})
+engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+
+@event.listens_for(engine, "connect")
+def _sqlite_pragma(dbapi_conn, _):
+    # WAL lets readers run alongside the writer and needs one fsync per checkpoint, not per commit
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA mmap_size=268435456")
+    cur.execute("PRAGMA cache_size=-64000")
+    cur.close()
+
+SessionLocal = sessionmaker(bind=engine, autoflush=False)
+Base = declarative_base()
+
+class UserProfile(Base):
+    __tablename__ = "profiles"
+    phone = Column(String, primary_key=True)
+    name = Column(String)
+    email = Column(String)
+    notes = Column(Text)
+    updated_at = Column(BigInteger)
+
+class DeviceToken(Base):
+    __tablename__ = "tokens"
+    phone = Column(String, primary_key=True)
+    token = Column(String, nullable=False)
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _migrate_json_to_db():
+    # one-time import of data/profiles.json and data/tokens.json into empty tables;
+    # the old files are kept
+    with SessionLocal() as db:
+        if db.query(UserProfile.phone).first() is None and os.path.exists(os.path.join("data", "profiles.json")):
+            rows = [
+                {
+                    "phone": phone,
+                    "name": p.get("name"),
+                    "email": p.get("email"),
+                    "notes": p.get("notes"),
+                    "updated_at": p.get("updated_at"),
+                }
+                for phone, p in _load_json("profiles.json", {}).items()
+            ]
+            if rows:
+                db.execute(sqlite_insert(UserProfile).on_conflict_do_nothing(), rows)
+        if db.query(DeviceToken.phone).first() is None and os.path.exists(os.path.join("data", "tokens.json")):
+            rows = [{"phone": phone, "token": token} for phone, token in _load_json("tokens.json", {}).items()]
+            if rows:
+                db.execute(sqlite_insert(DeviceToken).on_conflict_do_nothing(), rows)
+        db.commit()
+
+@contextlib.contextmanager
+def _startup_lock():
+    # uvicorn workers start in parallel; table creation and the one-time
+    # migrations are check-then-write, so only one worker runs them at a time
+    fd = os.open(os.path.join("data", ".startup.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # releases the lock
 
 # ---------------------
 # Firebase admin init (safe for Render)
 # ---------------------
-firebase_admin = None
+# set by lifespan(); None means notifications are disabled
 messaging = None
-try:
-    import firebase_admin
-    from firebase_admin import credentials, messaging as fcm_messaging
+
+def _init_firebase():
+    # imported here so the Google auth stack is not loaded at import time
+    try:
+        import firebase_admin
+        from firebase_admin import credentials, messaging as fcm_messaging
+    except Exception as e:
+        print("Firebase admin library not installed or failed to load:", str(e))
+        return None
+
+    try:
+        firebase_admin.get_app()
+        return fcm_messaging  # already initialized (e.g. app restarted in-process)
+    except ValueError:
+        pass
 
     sa_json = os.environ.get("FIREBASE_SERVICE_ACCOUNT_JSON")
     cred = None
@@ -67,24 +252,75 @@ try:
     if not cred and os.path.exists("medibuddy.json"):
         cred = credentials.Certificate("medibuddy.json")
 
-    if cred:
+    if not cred:
+        print("Firebase admin not initialized — no service account found (okay for dev).")
+        return None
+    try:
+        firebase_admin.initialize_app(cred)
+        print("Firebase admin initialized")
+        return fcm_messaging
+    except Exception as e:
+        print("Firebase admin init warning:", str(e))
+        return None
+
+# ---------------------
+# Background FCM sender
+# ---------------------
+FCM_BATCH_SIZE = 500  # messaging.send_each limit
+FCM_BATCH_WINDOW = 0.1  # seconds to wait for more messages before sending a batch
+
+# created in lifespan() so it belongs to the loop that runs _fcm_sender
+fcm_q: Optional[asyncio.Queue] = None
+
+async def _fcm_sender():
+    # drain fcm_q in batches so request handlers never wait on an FCM round-trip
+    loop = asyncio.get_running_loop()
+    while True:
+        msgs = [await fcm_q.get()]
+        deadline = loop.time() + FCM_BATCH_WINDOW
+        while len(msgs) < FCM_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                msgs.append(await asyncio.wait_for(fcm_q.get(), timeout))
+            except asyncio.TimeoutError:
+                break
         try:
-            firebase_admin.initialize_app(cred)
-            firebase_admin = firebase_admin
-            messaging = fcm_messaging
-            print("Firebase admin initialized")
+            resp = await loop.run_in_executor(None, messaging.send_each, msgs)
+            for r in resp.responses:
+                if not r.success:
+                    print("FCM send warning:", str(r.exception))
         except Exception as e:
-            # already initialized or other issue
-            print("Firebase admin init warning:", str(e))
-    else:
-        print("Firebase admin not initialized — no service account found (okay for dev).")
-except Exception as e:
-    print("Firebase admin library not installed or failed to load:", str(e))
+            print("FCM send warning:", str(e))
+
+def _on_fcm_sender_done(task):
+    if not task.cancelled() and task.exception() is not None:
+        print("FCM sender stopped:", repr(task.exception()))
 
 # ---------------------
 # FastAPI app
 # ---------------------
-app = FastAPI(title="MediBuddy Backend (simple)")
+@asynccontextmanager
+async def lifespan(app):
+    global messaging, fcm_q
+    with _startup_lock():
+        Base.metadata.create_all(engine)
+        _migrate_to_jsonl("reminders.json", "reminders.jsonl")
+        _migrate_to_jsonl("reviews.json", "reviews.jsonl")
+        _migrate_json_to_db()
+    messaging = _init_firebase()
+    fcm_q = asyncio.Queue()
+    sender = asyncio.create_task(_fcm_sender())
+    sender.add_done_callback(_on_fcm_sender_done)
+    try:
+        yield
+    finally:
+        sender.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await sender
+
+app = FastAPI(title="MediBuddy Backend (simple)", lifespan=lifespan)
 
 # Allow CORS from your frontend (you can tighten this later)
 app.add_middleware(
@@ -105,37 +341,116 @@ app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 def _new_id():
     return uuid.uuid4().hex
 
+def _build_reminder(payload):
+    # Ensure required fields exist
+    return {
+        "id": _new_id(),
+        "medicine": payload.medicine,
+        "timestamp": payload.timestamp or 0,
+        "phone": payload.phone,
+        "day": payload.day,
+        "created_at": int(datetime.utcnow().timestamp() * 1000),
+        "taken": False
+    }
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# anything outside this set (path separators, spaces, unicode) becomes "_"
+_SAFE_RE = re.compile(r"[^A-Za-z0-9._-]")
+
+def _copy_spooled_upload(src, save_path):
+    # the spool is an unnamed temp file, so it can't be renamed into uploads/;
+    # sendfile copies it inside the kernel without reading it into Python
+    in_fd = src.fileno()
+    size = os.fstat(in_fd).st_size
+    with open(save_path, "wb") as out:
+        try:
+            offset = 0
+            while offset < size:
+                sent = os.sendfile(out.fileno(), in_fd, offset, size - offset)
+                if not sent:
+                    break
+                offset += sent
+        except (OSError, AttributeError):
+            # platforms where sendfile needs a socket (or is missing)
+            src.seek(0)
+            out.seek(0)
+            out.truncate()
+            shutil.copyfileobj(src, out, UPLOAD_CHUNK_SIZE)
+
+# ---------------------
+# Request models
+# ---------------------
+# frozen: payloads are never mutated; extra="ignore": unknown client fields are dropped;
+# coerce_numbers_to_str: phone numbers may arrive as JSON numbers
+class _Payload(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore", coerce_numbers_to_str=True)
+
+# orjson encodes integers in [-2**63, 2**64); anything outside gets a 422
+_JsonInt = Annotated[int, Field(ge=-2**63, lt=2**64)]
+
+def _truncate_float(v):
+    # the dict-based handlers stored int(value), so 1700000000000.5 was accepted
+    return int(v) if isinstance(v, float) and math.isfinite(v) else v
+
+_TruncatedInt = Annotated[_JsonInt, BeforeValidator(_truncate_float)]
+
+class ReminderCreate(_Payload):
+    medicine: Optional[str] = None
+    timestamp: Optional[_TruncatedInt] = None
+    phone: Optional[str] = None
+    # stored as sent; clients may label days ("Mon") instead of numbering them
+    day: Optional[Union[_JsonInt, Annotated[str, Field(strict=True)]]] = 1
+
+class ChatRequest(_Payload):
+    message: Optional[str] = None
+
+class Review(_Payload):
+    name: Optional[str] = None
+    text: Optional[str] = None
+    rating: Optional[_TruncatedInt] = None
+    phone: Optional[str] = None
+
+class Profile(_Payload):
+    phone: Optional[str] = None
+    name: Optional[str] = None
+    email: Optional[str] = None
+    notes: Optional[str] = None
+
+class TokenModel(_Payload):
+    phone: Optional[str] = None
+    token: Optional[str] = None
+
+# a few doses a day over a multi-month course; larger batches get a 422
+MAX_BULK_REMINDERS = 500
+
 # ---------------------
 # API endpoints
 # ---------------------
 
 @app.get("/api/reminders")
 async def list_reminders():
-    data = _load_json("reminders.json", [])
+    data = _load_jsonl("reminders.jsonl")
     # ensure numeric timestamps
-    return JSONResponse(data)
+    return Response(orjson.dumps(data), media_type="application/json")
 
 @app.post("/api/reminders")
-async def create_reminder(payload: Dict[str, Any]):
-    data = _load_json("reminders.json", [])
-    # Ensure required fields exist
-    reminder = {
-        "id": _new_id(),
-        "medicine": payload.get("medicine"),
-        "timestamp": int(payload.get("timestamp") or 0),
-        "phone": payload.get("phone"),
-        "day": payload.get("day", 1),
-        "created_at": int(datetime.utcnow().timestamp() * 1000),
-        "taken": False
-    }
-    data.append(reminder)
-    _save_json("reminders.json", data)
+async def create_reminder(payload: ReminderCreate):
+    reminder = _build_reminder(payload)
+    _append_jsonl("reminders.jsonl", reminder)
     return JSONResponse({"ok": True, "id": reminder["id"]})
 
+@app.post("/api/reminders/bulk")
+async def create_reminders_bulk(payload: Annotated[List[ReminderCreate], Field(max_length=MAX_BULK_REMINDERS)]):
+    # schedule many reminders (e.g. one per day of a course) with a single write
+    reminders = [_build_reminder(item) for item in payload]
+    _append_jsonl_many("reminders.jsonl", reminders)
+    return JSONResponse({"ok": True, "n": len(reminders), "ids": [r["id"] for r in reminders]})
+
 @app.post("/api/chat")
-async def chat_endpoint(payload: Dict[str, Any]):
+async def chat_endpoint(payload: ChatRequest):
     # Minimal placeholder chat logic. Replace with real AI logic / backend later.
-    message = payload.get("message", "")
+    message = payload.message
     if not message:
         raise HTTPException(status_code=400, detail="message required")
     # naive reply — echo + safe suggestion
@@ -144,73 +459,85 @@ async def chat_endpoint(payload: Dict[str, Any]):
 
 @app.get("/api/reviews")
 async def get_reviews():
-    data = _load_json("reviews.json", [])
-    return JSONResponse(data)
+    data = _load_jsonl("reviews.jsonl")
+    return Response(orjson.dumps(data), media_type="application/json")
 
 @app.post("/api/reviews")
-async def post_review(payload: Dict[str, Any]):
-    data = _load_json("reviews.json", [])
+async def post_review(payload: Review):
     review = {
         "id": _new_id(),
-        "name": payload.get("name") or "Anonymous",
-        "text": payload.get("text") or "",
-        "rating": int(payload.get("rating") or 0),
-        "phone": payload.get("phone"),
+        "name": payload.name or "Anonymous",
+        "text": payload.text or "",
+        "rating": payload.rating or 0,
+        "phone": payload.phone,
         "created_at": int(datetime.utcnow().timestamp() * 1000),
     }
-    data.append(review)
-    _save_json("reviews.json", data)
+    _append_jsonl("reviews.jsonl", review)
     return JSONResponse({"ok": True, "id": review["id"]})
 
 @app.post("/api/profile")
-async def save_profile(payload: Dict[str, Any]):
-    profiles = _load_json("profiles.json", {})
-    phone = payload.get("phone")
+def save_profile(payload: Profile, db: Session = Depends(get_db)):
+    phone = payload.phone
     if not phone:
         raise HTTPException(status_code=400, detail="phone required")
-    profiles[phone] = {
-        "name": payload.get("name"),
-        "email": payload.get("email"),
-        "notes": payload.get("notes") or profiles.get(phone, {}).get("notes"),
-        "updated_at": int(datetime.utcnow().timestamp() * 1000)
-    }
-    _save_json("profiles.json", profiles)
+    stmt = sqlite_insert(UserProfile).values(
+        phone=phone,
+        name=payload.name,
+        email=payload.email,
+        notes=payload.notes or None,
+        updated_at=int(datetime.utcnow().timestamp() * 1000),
+    )
+    # keep the stored notes when the client sends none
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserProfile.phone],
+        set_={
+            "name": stmt.excluded.name,
+            "email": stmt.excluded.email,
+            "notes": func.coalesce(stmt.excluded.notes, UserProfile.notes),
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    db.execute(stmt)
+    db.commit()
     return JSONResponse({"ok": True})
 
 @app.post("/api/token/register")
-async def register_token(payload: Dict[str, Any]):
-    tokens = _load_json("tokens.json", {})
-    phone = payload.get("phone")
-    token = payload.get("token")
+def register_token(payload: TokenModel, db: Session = Depends(get_db)):
+    phone = payload.phone
+    token = payload.token
     if not phone or not token:
         raise HTTPException(status_code=400, detail="phone and token required")
-    tokens[phone] = token
-    _save_json("tokens.json", tokens)
+    stmt = sqlite_insert(DeviceToken).values(phone=phone, token=token)
+    db.execute(stmt.on_conflict_do_update(index_elements=[DeviceToken.phone], set_={"token": stmt.excluded.token}))
+    db.commit()
 
-    # Try to send a test notification (best-effort)
-    if messaging:
-        try:
-            message = {
-                "token": token,
-                "notification": {"title": "MediBuddy", "body": "Notifications enabled for this device."},
-            }
-            # send may raise if invalid token or permission issues
-            messaging.send(message)
-        except Exception as e:
-            print("FCM send warning:", str(e))
+    # Queue a test notification (best-effort); _fcm_sender delivers it
+    if messaging and fcm_q is not None:
+        message = messaging.Message(
+            token=token,
+            notification=messaging.Notification(title="MediBuddy", body="Notifications enabled for this device."),
+        )
+        # this handler runs in a worker thread; enqueue on the event loop
+        from_thread.run_sync(fcm_q.put_nowait, message)
 
     return JSONResponse({"ok": True})
 
 @app.post("/api/upload")
 async def upload_file(file: UploadFile = File(...)):
     # save uploaded file to uploads/ and return its public path
-    filename = file.filename or f"upload-{_new_id()}"
-    safe_name = f"{_new_id()}-{filename.replace(' ', '_')}"
+    # drop any client-supplied directories so the file always lands in uploads/
+    filename = _SAFE_RE.sub("_", os.path.basename(file.filename or ""))[:120] or "upload"
+    safe_name = f"{_new_id()}-{filename}"
     save_path = os.path.join("uploads", safe_name)
     try:
-        with open(save_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        if getattr(file.file, "_rolled", False):
+            # large uploads were already spooled to disk by the form parser
+            await run_in_threadpool(_copy_spooled_upload, file.file, save_path)
+        else:
+            async with aiofiles.open(save_path, "wb") as f:
+                # stream in 64 KiB chunks so large uploads are never held in memory
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    await f.write(chunk)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"failed to save: {e}")
     public_url = f"/uploads/{safe_name}"
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app_main(tmp_path, monkeypatch):
+    # main creates uploads/ and data/ relative to the cwd on import, and all
+    # storage helpers resolve data/ per call, so run each test in its own dir
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    (tmp_path / "uploads").mkdir()
+    import main
+
+    main._cache.clear()
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    main.Base.metadata.create_all(engine)
+    monkeypatch.setattr(main, "engine", engine)
+    monkeypatch.setattr(main, "SessionLocal", sessionmaker(bind=engine, autoflush=False))
+    monkeypatch.setattr(main, "_init_firebase", lambda: None)
+    yield main
+    engine.dispose()
+
+
+@pytest.fixture
+def client(app_main):
+    from fastapi.testclient import TestClient
+
+    with TestClient(app_main.app) as c:
+        yield c
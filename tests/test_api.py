@@ -0,0 +1,72 @@
+import pytest
+
+
+@pytest.mark.parametrize("value", [-1, 0, 2**64 - 1])
+def test_integer_fields_accept_orjson_range(client, value):
+    assert client.post("/api/reminders", json={"timestamp": value, "day": value}).status_code == 200
+    assert client.post("/api/reviews", json={"rating": value}).status_code == 200
+
+
+@pytest.mark.parametrize("value", [-(2**63) - 1, 2**64, 2**70])
+def test_integer_fields_outside_orjson_range_are_rejected(client, value):
+    assert client.post("/api/reminders", json={"timestamp": value}).status_code == 422
+    assert client.post("/api/reminders", json={"day": value}).status_code == 422
+    assert client.post("/api/reviews", json={"rating": value}).status_code == 422
+    assert client.get("/api/reminders").json() == []
+
+
+def test_bulk_reminders_are_stored_in_one_call(client):
+    week = [{"medicine": "amox", "day": d, "timestamp": 1000 * d, "phone": "1"} for d in range(1, 8)]
+    body = client.post("/api/reminders/bulk", json=week).json()
+    assert body["ok"] and body["n"] == 7 and len(set(body["ids"])) == 7
+
+    stored = client.get("/api/reminders").json()
+    assert [r["id"] for r in stored] == body["ids"]
+    assert [r["day"] for r in stored] == list(range(1, 8))
+    assert all(r["taken"] is False and r["medicine"] == "amox" for r in stored)
+
+
+def test_bulk_reminders_size_is_capped(app_main, client):
+    too_many = [{"medicine": "x"}] * (app_main.MAX_BULK_REMINDERS + 1)
+    assert client.post("/api/reminders/bulk", json=too_many).status_code == 422
+    assert client.get("/api/reminders").json() == []
+    full = [{"medicine": "x"}] * app_main.MAX_BULK_REMINDERS
+    assert client.post("/api/reminders/bulk", json=full).json()["n"] == app_main.MAX_BULK_REMINDERS
+
+
+def test_reminder_fields_accept_what_the_dict_handlers_did(client):
+    sent = {"medicine": "m", "timestamp": 1700000000000.5, "day": "Mon", "phone": 9876, "unknown": 1}
+    rid = client.post("/api/reminders", json=sent).json()["id"]
+    stored = client.get("/api/reminders").json()[0]
+    assert stored["id"] == rid
+    assert (stored["timestamp"], stored["day"], stored["phone"]) == (1700000000000, "Mon", "9876")
+    assert "unknown" not in stored
+
+    client.post("/api/reviews", json={"rating": "4", "name": None})
+    review = client.get("/api/reviews").json()[0]
+    assert (review["rating"], review["name"], review["text"]) == (4, "Anonymous", "")
+
+
+@pytest.mark.parametrize(
+    "path, body",
+    [
+        ("/api/reminders", {"timestamp": "soon"}),
+        ("/api/reminders", {"day": {"n": 1}}),
+        ("/api/reviews", {"rating": [5]}),
+    ],
+)
+def test_wrongly_typed_fields_are_rejected(client, path, body):
+    assert client.post(path, json=body).status_code == 422
+
+
+@pytest.mark.parametrize(
+    "path, body, detail",
+    [
+        ("/api/chat", {}, "message required"),
+        ("/api/profile", {"name": "x"}, "phone required"),
+        ("/api/token/register", {"phone": "1"}, "phone and token required"),
+    ],
+)
+def test_missing_required_values_keep_their_400s(client, path, body, detail):
+    resp = client.post(path, json=body)
+    assert resp.status_code == 400 and resp.json()["detail"] == detail
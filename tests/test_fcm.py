@@ -0,0 +1,63 @@
+import time
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+
+class FakeMessaging:
+    Message = SimpleNamespace
+    Notification = SimpleNamespace
+
+    def __init__(self):
+        self.batches = []
+
+    def send_each(self, msgs):
+        self.batches.append([m.token for m in msgs])
+        return SimpleNamespace(responses=[SimpleNamespace(success=True, exception=None) for _ in msgs])
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_registrations_are_sent_as_one_batch(app_main, monkeypatch):
+    fake = FakeMessaging()
+    monkeypatch.setattr(app_main, "_init_firebase", lambda: fake)
+    with TestClient(app_main.app) as client:
+        for i in range(20):
+            assert client.post("/api/token/register", json={"phone": str(i), "token": f"t{i}"}).json() == {"ok": True}
+        assert _wait_for(lambda: sum(map(len, fake.batches)) == 20)
+    assert fake.batches == [[f"t{i}" for i in range(20)]]
+
+
+def test_sender_keeps_working_after_lifespan_restart(app_main, monkeypatch):
+    fake = FakeMessaging()
+    monkeypatch.setattr(app_main, "_init_firebase", lambda: fake)
+    for run in range(2):
+        with TestClient(app_main.app) as client:
+            client.post("/api/token/register", json={"phone": "1", "token": f"run{run}"})
+            assert _wait_for(lambda: len(fake.batches) == run + 1)
+    assert fake.batches == [["run0"], ["run1"]]
+
+
+def test_send_failure_is_logged_and_sender_survives(app_main, monkeypatch, capsys):
+    fake = FakeMessaging()
+    calls = []
+
+    def flaky_send_each(msgs):
+        calls.append(msgs)
+        if len(calls) == 1:
+            raise RuntimeError("fcm down")
+        return FakeMessaging.send_each(fake, msgs)
+
+    fake.send_each = flaky_send_each
+    monkeypatch.setattr(app_main, "_init_firebase", lambda: fake)
+    with TestClient(app_main.app) as client:
+        client.post("/api/token/register", json={"phone": "1", "token": "a"})
+        assert _wait_for(lambda: len(calls) == 1)
+        client.post("/api/token/register", json={"phone": "2", "token": "b"})
+        assert _wait_for(lambda: fake.batches == [["b"]])
+    assert "FCM send warning: fcm down" in capsys.readouterr().out
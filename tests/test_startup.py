@@ -0,0 +1,42 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# one uvicorn worker's startup: import main and run its lifespan
+WORKER = f"""
+import asyncio, sys
+sys.path.insert(0, {REPO!r})
+import main
+
+async def start():
+    async with main.lifespan(main.app):
+        pass
+
+asyncio.run(start())
+"""
+
+
+def test_parallel_worker_startups_create_tables_and_migrate_once(tmp_path):
+    for round_ in range(3):
+        root = tmp_path / str(round_)
+        (root / "data").mkdir(parents=True)
+        (root / "data" / "reminders.json").write_text(json.dumps([{"id": str(i)} for i in range(50)]))
+        (root / "data" / "profiles.json").write_text(json.dumps({"1": {"name": "ann"}}))
+        (root / "data" / "tokens.json").write_text(json.dumps({"1": "tok"}))
+
+        workers = [
+            subprocess.Popen([sys.executable, "-c", WORKER], cwd=root, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            for _ in range(6)
+        ]
+        errors = [w.communicate()[1].decode() for w in workers if w.wait() != 0]
+        assert errors == []
+
+        lines = (root / "data" / "reminders.jsonl").read_text().splitlines()
+        assert [json.loads(line)["id"] for line in lines] == [str(i) for i in range(50)]
+        with sqlite3.connect(root / "medibuddy.db") as con:
+            assert con.execute("select count(*) from profiles").fetchone() == (1,)
+            assert con.execute("select count(*) from tokens").fetchone() == (1,)
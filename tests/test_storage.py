@@ -0,0 +1,94 @@
+import json
+
+
+def _append_raw(tmp_path, filename, data):
+    with open(tmp_path / "data" / filename, "ab") as f:
+        f.write(data)
+
+
+def test_append_extends_cached_list(app_main):
+    app_main._append_jsonl("reviews.jsonl", {"id": "a"})
+    first = app_main._load_jsonl("reviews.jsonl")
+    app_main._append_jsonl("reviews.jsonl", {"id": "b"})
+    second = app_main._load_jsonl("reviews.jsonl")
+    assert second is first
+    assert [r["id"] for r in second] == ["a", "b"]
+
+
+def test_cache_invalidated_by_other_writer(app_main, tmp_path):
+    app_main._append_jsonl("reviews.jsonl", {"id": "a"})
+    assert len(app_main._load_jsonl("reviews.jsonl")) == 1
+    _append_raw(tmp_path, "reviews.jsonl", b'{"id":"ext"}\n')
+    assert [r["id"] for r in app_main._load_jsonl("reviews.jsonl")] == ["a", "ext"]
+
+
+def test_append_after_other_writer_does_not_extend_stale_cache(app_main, tmp_path):
+    app_main._append_jsonl("reviews.jsonl", {"id": "a"})
+    app_main._load_jsonl("reviews.jsonl")
+    _append_raw(tmp_path, "reviews.jsonl", b'{"id":"ext"}\n')
+    app_main._append_jsonl("reviews.jsonl", {"id": "b"})
+    assert [r["id"] for r in app_main._load_jsonl("reviews.jsonl")] == ["a", "ext", "b"]
+
+
+def test_partial_line_is_skipped_and_not_appended_to(app_main, tmp_path):
+    _append_raw(tmp_path, "reminders.jsonl", b'{"id":"a"}\n{"id":"b","medi')
+    assert [r["id"] for r in app_main._load_jsonl("reminders.jsonl")] == ["a"]
+    app_main._append_jsonl("reminders.jsonl", {"id": "c"})
+    app_main._cache.clear()
+    assert [r["id"] for r in app_main._load_jsonl("reminders.jsonl")] == ["a", "c"]
+
+
+def test_migrate_list_file_to_jsonl(app_main, tmp_path):
+    items = [{"id": "a", "medicine": "x"}, {"id": "b", "medicine": "y"}]
+    (tmp_path / "data" / "reminders.json").write_text(json.dumps(items))
+    app_main._migrate_to_jsonl("reminders.json", "reminders.jsonl")
+    assert app_main._load_jsonl("reminders.jsonl") == items
+    assert (tmp_path / "data" / "reminders.json").exists()
+
+    # already migrated: a later run must not overwrite newer records
+    app_main._append_jsonl("reminders.jsonl", {"id": "c"})
+    app_main._migrate_to_jsonl("reminders.json", "reminders.jsonl")
+    app_main._cache.clear()
+    assert [r["id"] for r in app_main._load_jsonl("reminders.jsonl")] == ["a", "b", "c"]
+
+
+def test_migrate_skips_unreadable_list_file(app_main, tmp_path, capsys):
+    (tmp_path / "data" / "reminders.json").write_text('[{"id":"a"},{"id":"b"')
+    app_main._migrate_to_jsonl("reminders.json", "reminders.jsonl")
+    assert not (tmp_path / "data" / "reminders.jsonl").exists()
+    assert (tmp_path / "data" / "reminders.json").exists()
+    assert "Not migrating reminders.json" in capsys.readouterr().out
+
+
+def test_migrate_json_files_to_db(app_main, tmp_path):
+    (tmp_path / "data" / "profiles.json").write_text(
+        json.dumps({"1": {"name": "ann", "email": "a@x", "notes": "n", "updated_at": 5}})
+    )
+    (tmp_path / "data" / "tokens.json").write_text(json.dumps({"1": "tok"}))
+    app_main._migrate_json_to_db()
+
+    with app_main.SessionLocal() as db:
+        profile = db.get(app_main.UserProfile, "1")
+        assert (profile.name, profile.email, profile.notes, profile.updated_at) == ("ann", "a@x", "n", 5)
+        assert db.get(app_main.DeviceToken, "1").token == "tok"
+
+        # tables that already hold data are left alone on later starts
+        db.get(app_main.DeviceToken, "1").token = "newer"
+        db.commit()
+    app_main._migrate_json_to_db()
+    with app_main.SessionLocal() as db:
+        assert db.get(app_main.DeviceToken, "1").token == "newer"
+        assert db.query(app_main.UserProfile).count() == 1
+
+
+def test_profile_update_without_notes_keeps_stored_notes(app_main):
+    with app_main.SessionLocal() as db:
+        app_main.save_profile(app_main.Profile(phone="1", name="ann", notes="allergic"), db)
+        app_main.save_profile(app_main.Profile(phone="1", name="anne"), db)
+        profile = db.get(app_main.UserProfile, "1")
+        db.refresh(profile)
+        assert (profile.name, profile.notes) == ("anne", "allergic")
+
+        app_main.save_profile(app_main.Profile(phone="1", name="anne", notes="none"), db)
+        db.refresh(profile)
+        assert profile.notes == "none"
@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "sent, stored",
+    [
+        ("../../x.bin", "x.bin"),
+        ("/etc/passwd", "passwd"),
+        ("..\\..\\evil.txt", ".._.._evil.txt"),
+        ("my report (1).pdf", "my_report__1_.pdf"),
+        ("rezeptä.png", "rezept_.png"),
+        ("..", ".."),
+        ("dir/", "upload"),
+    ],
+)
+def test_upload_names_are_sanitized_into_uploads_dir(client, tmp_path, sent, stored):
+    body = client.post("/api/upload", files={"file": (sent, b"data")}).json()
+    assert body["ok"]
+    prefix, name = body["filename"].split("-", 1)
+    assert len(prefix) == 32 and name == stored
+    saved = tmp_path / "uploads" / body["filename"]
+    assert saved.resolve().parent == (tmp_path / "uploads").resolve()
+    assert saved.read_bytes() == b"data"
+    assert body["path"] == f"/uploads/{body['filename']}"
+
+
+def test_upload_name_is_capped(client):
+    body = client.post("/api/upload", files={"file": ("a" * 500 + ".txt", b"x")}).json()
+    assert len(body["filename"].split("-", 1)[1]) == 120
+
+
+@pytest.fixture
+def spooled_copies(app_main, monkeypatch):
+    calls = []
+    copy = app_main._copy_spooled_upload
+
+    def spy(src, save_path):
+        calls.append(save_path)
+        copy(src, save_path)
+
+    monkeypatch.setattr(app_main, "_copy_spooled_upload", spy)
+    return calls
+
+
+def test_large_upload_is_copied_from_spool_intact(client, tmp_path, spooled_copies):
+    data = os.urandom(3 * 1024 * 1024 + 123)  # over the 1 MiB spool threshold
+    body = client.post("/api/upload", files={"file": ("scan.bin", data)}).json()
+    assert len(spooled_copies) == 1
+    assert (tmp_path / "uploads" / body["filename"]).read_bytes() == data
+    assert client.get(body["path"]).content == data
+
+
+def test_small_upload_is_streamed_not_spool_copied(client, tmp_path, spooled_copies):
+    data = os.urandom(4096)
+    body = client.post("/api/upload", files={"file": ("note.txt", data)}).json()
+    assert spooled_copies == []
+    assert (tmp_path / "uploads" / body["filename"]).read_bytes() == data
+
+
+def _fail_sendfile(*args):
+    raise OSError(22, "sendfile needs a socket here")
+
+
+@pytest.mark.parametrize("break_sendfile", ["raise", "missing"])
+def test_large_upload_falls_back_without_sendfile(client, tmp_path, monkeypatch, spooled_copies, break_sendfile):
+    if break_sendfile == "raise":
+        monkeypatch.setattr(os, "sendfile", _fail_sendfile)
+    else:
+        monkeypatch.delattr(os, "sendfile")
+    data = os.urandom(2 * 1024 * 1024)
+    body = client.post("/api/upload", files={"file": ("scan.bin", data)}).json()
+    assert len(spooled_copies) == 1
+    assert (tmp_path / "uploads" / body["filename"]).read_bytes() == data